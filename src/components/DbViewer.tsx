@@ -42,6 +42,7 @@ export function DbViewer() {
   const [columns, setColumns] = useState<Column[]>([]);
   const [rows, setRows] = useState<RowsResponse | null>(null);
   const [totalCount, setTotalCount] = useState<number>(0);
+  const [countApproximate, setCountApproximate] = useState(false);
   const [page, setPage] = useState(0);
   const [loading, setLoading] = useState(false);
   const [error, setError] = useState<string | null>(null);
@@ -114,6 +115,7 @@ export function DbViewer() {
       const rowData = await rowRes.json();
       setColumns(colData);
       setTotalCount(countData.count);
+      setCountApproximate(!!countData.approximate);
       setRows(rowData);
     } catch (err) {
       setError((err as Error).message);
@@ -216,7 +218,7 @@ export function DbViewer() {
               <h2 style={styles.tableName}>
                 {selectedTable.schema}.{selectedTable.table}
               </h2>
-              {totalCount > 0 && <span style={styles.rowCount}>{totalCount.toLocaleString()} rows</span>}
+              {totalCount > 0 && <span style={styles.rowCount}>{countApproximate ? '~' : ''}{totalCount.toLocaleString()} rows</span>}
             </div>
 
             {loading ? (
@@ -294,7 +296,7 @@ export function DbViewer() {
                       ◀ Prev
                     </button>
                     <span style={styles.pageText}>
-                      Showing {(page * PAGE_SIZE + 1).toLocaleString()}–{Math.min((page + 1) * PAGE_SIZE, totalCount).toLocaleString()} of {totalCount.toLocaleString()}
+                      Showing {(page * PAGE_SIZE + 1).toLocaleString()}–{Math.min((page + 1) * PAGE_SIZE, totalCount).toLocaleString()} of {countApproximate ? '~' : ''}{totalCount.toLocaleString()}
                     </span>
                     <button
                       style={{ ...styles.pageBtn, ...(page >= totalPages - 1 ? styles.pageBtnDisabled : {}) }}
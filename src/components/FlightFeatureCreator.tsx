@@ -17,9 +17,32 @@ interface CreateResult {
   success: boolean;
   dataset_name?: string;
   row_count?: number;
+  parquet_job_id?: string;
   error?: string;
 }
 
+interface ParquetJobStatus {
+  status: 'running' | 'done' | 'failed' | 'unknown';
+  error?: string;
+  result?: { error?: string };
+}
+
+const PARQUET_POLL_INTERVAL_MS = 2000;
+// Matches the API's PARQUET_JOB_TIMEOUT default - give up polling after this
+const PARQUET_JOB_TIMEOUT_MS = 60 * 60 * 1000;
+
+// Parquet export runs in the background after the table is created - wait for it
+async function waitForParquetJob(jobId: string): Promise<ParquetJobStatus> {
+  const deadline = Date.now() + PARQUET_JOB_TIMEOUT_MS;
+  while (Date.now() < deadline) {
+    const res = await apiFetch(`${API_BASE}/flight-features/parquet/status?job_id=${jobId}`);
+    const status: ParquetJobStatus = await res.json();
+    if (status.status !== 'running') return status;
+    await new Promise(resolve => setTimeout(resolve, PARQUET_POLL_INTERVAL_MS));
+  }
+  return { status: 'failed', error: 'Timed out waiting for the Parquet export' };
+}
+
 interface PreviewData {
   columns: string[];
   rows: Record<string, unknown>[];
@@ -127,6 +150,12 @@ export function FlightFeatureCreator() {
       const result: CreateResult = await res.json();
 
       if (result.success) {
+        if (result.parquet_job_id) {
+          const job = await waitForParquetJob(result.parquet_job_id);
+          if (job.status !== 'done') {
+            setError(`Parquet export failed: ${job.result?.error || job.error || job.status}`);
+          }
+        }
         setSuccess(result);
         setCustomName('');
         await refreshDatasets();
@@ -1,16 +1,31 @@
 # file: main.py
-from fastapi import FastAPI
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, Header, Response
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import FileResponse
+from fastapi.responses import FileResponse, StreamingResponse
+from sqlalchemy.exc import DataError
 import uvicorn
 import os
 
-from db import engine
+from db import WEB_WORKERS, engine, warm_pool
+from responses import RowsJSONResponse, SelectiveGZipMiddleware, wants_arrow
 from services import schemas, tables, data, flight_features
-from services import parquet_export
+from services import parquet_export, parquet_jobs
+from services.cache import cache_status, clear_all as clear_metadata_cache
+from services.serialization import ARROW_STREAM_MEDIA_TYPE
 from services.r2_storage import list_parquets_in_r2
 
-app = FastAPI(title="DB Viewer API", version="1.0.0")
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Fill the connection pool before serving so the first burst of requests
+    # doesn't stampede the database with handshakes
+    await warm_pool()
+    yield
+    await engine.dispose()
+
+
+app = FastAPI(title="DB Viewer API", version="1.0.0", lifespan=lifespan)
 
 app.add_middleware(
     CORSMiddleware,
@@ -20,44 +35,72 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Row payloads (JSON/NDJSON) are very repetitive - compress anything non-trivial
+# except Parquet downloads and Arrow streams.
+# Level 6 keeps most of the ratio at a fraction of level 9's CPU cost.
+app.add_middleware(SelectiveGZipMiddleware, minimum_size=1024, compresslevel=6)
+
+
+def error_response(e: Exception, **fields) -> RowsJSONResponse:
+    """JSON error for a request that failed before any body was sent:
+    400 for bad input (missing dataset, unparseable cursor), 500 otherwise"""
+    status_code = 400 if isinstance(e, (ValueError, DataError)) else 500
+    return RowsJSONResponse({**fields, "error": str(e)}, status_code=status_code)
+
 
 @app.get("/schemas")
-async def get_schemas():
-    return await schemas.get_schemas(engine)
+async def get_schemas(response: Response):
+    result = await schemas.get_schemas(engine)
+    response.headers["X-Cache"] = cache_status.get()
+    return result
 
 
 @app.get("/tables")
-async def get_tables(schema: str = "public"):
-    return await tables.get_tables(engine, schema)
+async def get_tables(response: Response, schema: str = "public"):
+    result = await tables.get_tables(engine, schema)
+    response.headers["X-Cache"] = cache_status.get()
+    return result
 
 
 @app.get("/columns")
-async def get_columns(schema: str = "public", table: str = ""):
-    return await data.get_columns(engine, schema, table)
+async def get_columns(response: Response, schema: str = "public", table: str = ""):
+    result = await data.get_columns(engine, schema, table)
+    response.headers["X-Cache"] = cache_status.get()
+    return result
 
 
 @app.get("/count")
-async def get_count(schema: str = "public", table: str = ""):
-    return await data.get_row_count(engine, schema, table)
+async def get_count(schema: str = "public", table: str = "", exact: bool = False):
+    return await data.get_row_count(engine, schema, table, exact)
 
 
 @app.get("/rows")
 async def get_rows(schema: str = "public", table: str = "", limit: int = 50, offset: int = 0):
-    return await data.get_rows(engine, schema, table, limit, offset)
+    return RowsJSONResponse(await data.get_rows(engine, schema, table, limit, offset))
+
+
+@app.post("/admin/flush-cache")
+async def flush_cache():
+    """Drop all cached schema/table/column metadata"""
+    return {"success": True, "flushed": clear_metadata_cache()}
 
 
 # ============== Flight Features Endpoints ==============
 
 @app.get("/flight-features/dates")
-async def get_dates():
+async def get_dates(response: Response):
     """Get available dates from sur_air schema"""
-    return await flight_features.get_available_sur_air_dates(engine)
+    result = await flight_features.get_available_sur_air_dates(engine)
+    response.headers["X-Cache"] = cache_status.get()
+    return result
 
 
 @app.get("/flight-features/airports")
-async def get_airports(date: str):
+async def get_airports(response: Response, date: str):
     """Get available airports (dep/dest) for a given date"""
-    return await flight_features.get_airports_for_date(engine, date)
+    result = await flight_features.get_airports_for_date(engine, date)
+    response.headers["X-Cache"] = cache_status.get()
+    return result
 
 
 @app.get("/flight-features/preview-count")
@@ -69,7 +112,7 @@ async def get_preview_count(date: str, airport: str = ""):
 @app.get("/flight-features/datasets")
 async def list_datasets():
     """List all flight feature datasets available in R2"""
-    return list_parquets_in_r2()
+    return await list_parquets_in_r2()
 
 
 @app.post("/flight-features/create")
@@ -83,9 +126,15 @@ async def create_dataset(date: str, name: str = "", airport: str = ""):
 
 
 @app.get("/flight-features/preview")
-async def preview_dataset(dataset: str, limit: int = 50, offset: int = 0):
-    """Preview rows from a flight feature dataset"""
-    return await flight_features.export_dataset_preview(engine, dataset, limit, offset)
+async def preview_dataset(dataset: str, limit: int = 50, offset: int = 0, accept: str | None = Header(None)):
+    """Preview rows from a flight feature dataset (Arrow IPC if requested via Accept)"""
+    if wants_arrow(accept):
+        try:
+            body = await flight_features.export_dataset_preview_arrow(engine, dataset, limit, offset)
+            return Response(body, media_type=ARROW_STREAM_MEDIA_TYPE)
+        except Exception as e:
+            return error_response(e, columns=[], rows=[])
+    return RowsJSONResponse(await flight_features.export_dataset_preview(engine, dataset, limit, offset))
 
 
 @app.delete("/flight-features/delete")
@@ -101,45 +150,91 @@ async def get_airports_from_dataset(dataset: str):
 
 
 @app.get("/flight-features/count")
-async def get_count_filtered(dataset: str, dep: str = "", dest: str = ""):
-    """Get row count for dataset with optional filters"""
+async def get_count_filtered(dataset: str, dep: str = "", dest: str = "", exact: bool = False):
+    """Get row count for dataset with optional filters (approximate when unfiltered unless exact)"""
     return await flight_features.get_dataset_row_count(
         engine, dataset,
         dep_filter=dep if dep else None,
-        dest_filter=dest if dest else None
+        dest_filter=dest if dest else None,
+        exact=exact
     )
 
 
 @app.get("/flight-features/export")
-async def export_filtered(dataset: str, dep: str = "", dest: str = "", limit: int = 0, offset: int = 0, batch_size: int = 50000):
-    """Export dataset filtered by airport codes with pagination support"""
-    return await flight_features.export_dataset_filtered(
-        engine, dataset, 
+async def export_filtered(
+    dataset: str,
+    dep: str = "",
+    dest: str = "",
+    limit: int = 0,
+    offset: int = 0,
+    batch_size: int = 50000,
+    after_flight_key: str = "",
+    after_time_of_track: str = "",
+    accept: str | None = Header(None),
+):
+    """Export dataset filtered by airport codes with pagination support
+    (streamed as NDJSON, or as Arrow IPC if requested via Accept)"""
+    export_args = dict(
         dep_filter=dep if dep else None,
         dest_filter=dest if dest else None,
         limit=limit if limit > 0 else None,
         offset=offset,
-        batch_size=batch_size
+        batch_size=batch_size,
+        after_flight_key=after_flight_key if after_flight_key else None,
+        after_time_of_track=after_time_of_track if after_time_of_track else None
+    )
+    if wants_arrow(accept):
+        # Arrow has no in-band error line like the NDJSON footer, so the
+        # query is started before the response to report failures by status
+        try:
+            stream = await flight_features.export_dataset_filtered_arrow(engine, dataset, **export_args)
+        except Exception as e:
+            return error_response(e)
+        return StreamingResponse(stream, media_type=ARROW_STREAM_MEDIA_TYPE)
+    return StreamingResponse(
+        flight_features.export_dataset_filtered(engine, dataset, **export_args),
+        media_type="application/x-ndjson"
     )
 
 
 # ============== Parquet Endpoints ==============
 
 @app.post("/flight-features/parquet/generate")
-async def generate_parquet(dataset: str, dep: str = "", dest: str = "", force: bool = False):
+async def generate_parquet(
+    dataset: str,
+    dep: str = "",
+    dest: str = "",
+    force: bool = False,
+    row_group_size: int = parquet_export.PARQUET_ROW_GROUP_SIZE
+):
     """Generate a Parquet file from a flight feature dataset"""
     return await parquet_export.generate_parquet(
         engine, dataset,
         dep=dep if dep else None,
         dest=dest if dest else None,
-        force=force
+        force=force,
+        row_group_size=row_group_size
     )
 
 
+@app.post("/flight-features/parquet/generate-shards")
+async def generate_parquet_shards(dataset: str, shard_by: str = "dep,dest", force: bool = False):
+    """Start a background job exporting one Parquet file per dep/dest shard (returns `job_id`)"""
+    shard_cols = tuple(col.strip() for col in shard_by.split(",") if col.strip())
+    job_id = parquet_jobs.start_parquet_shards_job(engine, dataset, shard_by=shard_cols, force=force)
+    return {"success": True, "job_id": job_id}
+
+
+@app.get("/flight-features/parquet/status")
+async def parquet_job_status(job_id: str):
+    """Get the status of a background Parquet generation job"""
+    return parquet_jobs.get_parquet_job(job_id)
+
+
 @app.get("/flight-features/parquet/check")
 async def check_parquet(dataset: str, dep: str = "", dest: str = ""):
     """Check if a Parquet file exists for the dataset"""
-    return parquet_export.parquet_exists(
+    return await parquet_export.parquet_exists(
         dataset,
         dep=dep if dep else None,
         dest=dest if dest else None
@@ -149,7 +244,7 @@ async def check_parquet(dataset: str, dep: str = "", dest: str = ""):
 @app.get("/flight-features/parquet/list")
 async def list_parquet_files():
     """List all available Parquet files from R2 bucket"""
-    return list_parquets_in_r2()
+    return await list_parquets_in_r2()
 
 
 @app.get("/flight-features/parquet/download")
@@ -157,7 +252,7 @@ async def download_parquet(dataset: str, dep: str = "", dest: str = ""):
     """Download the Parquet file for a dataset - redirects to R2 if available"""
     from fastapi.responses import RedirectResponse
     
-    info = parquet_export.parquet_exists(
+    info = await parquet_export.parquet_exists(
         dataset,
         dep=dep if dep else None,
         dest=dest if dest else None
@@ -179,4 +274,16 @@ async def download_parquet(dataset: str, dep: str = "", dest: str = ""):
 
 
 if __name__ == "__main__":
-    uvicorn.run("main:app", host="0.0.0.0", port=8000, reload=True)
+    # DEV=1 runs a single auto-reloading process; otherwise run WEB_CONCURRENCY
+    # workers. loop/http "auto" use uvloop + httptools from uvicorn[standard]
+    # where they're available (uvloop doesn't support Windows).
+    dev = bool(os.getenv("DEV"))
+    uvicorn.run(
+        "main:app",
+        host="0.0.0.0",
+        port=8000,
+        workers=WEB_WORKERS,
+        loop="auto",
+        http="auto",
+        reload=dev,
+    )
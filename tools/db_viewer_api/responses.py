@@ -0,0 +1,38 @@
+from fastapi.middleware.gzip import GZipMiddleware
+from fastapi.responses import Response
+
+from services.serialization import ARROW_STREAM_MEDIA_TYPE, dumps_json
+
+
+class RowsJSONResponse(Response):
+    """
+    orjson response for row payloads straight from the database.
+    NaN/Inf floats become null, and anything orjson can't encode natively
+    (Decimal, dates/times, ...) falls back to str() like the old per-cell loop did.
+    """
+    media_type = "application/json"
+
+    def render(self, content) -> bytes:
+        return dumps_json(content)
+
+
+def wants_arrow(accept: str | None) -> bool:
+    """True when the client asked for an Arrow IPC stream via the Accept header"""
+    return bool(accept) and ARROW_STREAM_MEDIA_TYPE in accept
+
+
+# Endpoints serving already-compressed (zstd) Parquet - gzip would only burn
+# CPU on them and drop Content-Length/range support
+_NO_GZIP_PATHS = {"/flight-features/parquet/download"}
+
+
+class SelectiveGZipMiddleware(GZipMiddleware):
+    """GZipMiddleware that passes Parquet downloads and Arrow IPC responses through uncompressed"""
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] == "http":
+            accept = dict(scope["headers"]).get(b"accept", b"").decode("latin-1")
+            if scope["path"] in _NO_GZIP_PATHS or wants_arrow(accept):
+                await self.app(scope, receive, send)
+                return
+        await super().__call__(scope, receive, send)
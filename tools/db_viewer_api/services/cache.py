@@ -0,0 +1,63 @@
+"""
+In-process TTL cache for catalog/metadata lookups.
+Catalog queries (information_schema, pg_tables) are expensive and their
+results only change when datasets are created or dropped.
+"""
+import time
+from contextvars import ContextVar
+from functools import wraps
+
+# "HIT" or "MISS" for the most recent cached call in the current request
+cache_status: ContextVar[str] = ContextVar("cache_status", default="MISS")
+
+_caches: list[dict] = []
+
+# TTL for lookups that change when a dataset is created or deleted. clear_all()
+# only reaches the worker process that handled the change, so the others stay
+# stale until this expires
+DATASET_METADATA_TTL = 30
+
+
+def ttl_cache(ttl: float = 300, maxsize: int = 256):
+    """
+    Cache an async function's result per arguments for `ttl` seconds.
+    The first positional argument (engine/connection) is not part of the key.
+    Empty results ([] / None) and exceptions are not cached - they usually mean
+    the object doesn't exist yet or the lookup failed.
+    """
+    def decorator(func):
+        entries: dict = {}
+        _caches.append(entries)
+
+        @wraps(func)
+        async def wrapper(engine, *args, **kwargs):
+            key = (args, tuple(sorted(kwargs.items())))
+            now = time.monotonic()
+            cached = entries.get(key)
+            if cached is not None and cached[0] > now:
+                cache_status.set("HIT")
+                return cached[1]
+
+            value = await func(engine, *args, **kwargs)
+            cache_status.set("MISS")
+            if not value:
+                entries.pop(key, None)
+                return value
+            if key not in entries and len(entries) >= maxsize:
+                # Evict the oldest entry
+                entries.pop(next(iter(entries)))
+            entries[key] = (now + ttl, value)
+            return value
+
+        wrapper.cache_clear = entries.clear
+        return wrapper
+    return decorator
+
+
+def clear_all() -> int:
+    """Drop every cached entry, returns the number of entries removed"""
+    removed = 0
+    for entries in _caches:
+        removed += len(entries)
+        entries.clear()
+    return removed
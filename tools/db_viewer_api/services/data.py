@@ -1,8 +1,24 @@
 # file: services/data.py
+import re
 from sqlalchemy import text
-from sqlalchemy.ext.asyncio import AsyncEngine
+from sqlalchemy.ext.asyncio import AsyncConnection, AsyncEngine
 
+from .cache import DATASET_METADATA_TTL, ttl_cache
 
+# Float types that can hold NaN/Infinity (not valid JSON)
+_FLOAT_TYPES = {"real", "double precision"}
+
+# Plain ASCII PostgreSQL identifier (max 63 bytes). str.isidentifier() would
+# also accept Unicode letters.
+_IDENT_RE = re.compile(r'^[A-Za-z_][A-Za-z0-9_]{0,62}\Z')
+
+
+def qident(name: str) -> str:
+    """Quote an SQL identifier, doubling any embedded quotes"""
+    return '"' + name.replace('"', '""') + '"'
+
+
+@ttl_cache(ttl=DATASET_METADATA_TTL)
 async def get_columns(engine: AsyncEngine, schema: str, table: str) -> list[dict]:
     query = text("""
         SELECT column_name, data_type, is_nullable, column_default
@@ -24,16 +40,57 @@ async def get_columns(engine: AsyncEngine, schema: str, table: str) -> list[dict
     ]
 
 
-async def get_row_count(engine: AsyncEngine, schema: str, table: str) -> dict:
-    """Fast count query - doesn't load any data"""
-    if not schema.isidentifier() or not table.isidentifier():
+def nan_safe_select_list(columns: list[dict]) -> str:
+    """
+    SELECT list (from get_columns output) that turns NaN/Infinity into NULL
+    inside PostgreSQL, so rows need no per-cell cleanup in Python.
+    Falls back to * when the columns are unknown.
+    """
+    if not columns:
+        return "*"
+    parts = []
+    for col in columns:
+        name = qident(col["column_name"])
+        if col["data_type"] in _FLOAT_TYPES:
+            parts.append(f"CASE WHEN {name} IN ('NaN', 'Infinity', '-Infinity') THEN NULL ELSE {name} END AS {name}")
+        else:
+            parts.append(name)
+    return ", ".join(parts)
+
+
+async def get_approximate_row_count(conn: AsyncConnection, schema: str, table: str) -> int | None:
+    """
+    Planner's row estimate from pg_class.reltuples - O(1), kept fresh by autovacuum.
+    Returns None when there's no usable estimate (never analyzed, partitioned parent).
+    """
+    query = text("""
+        SELECT c.reltuples::bigint
+        FROM pg_class c
+        JOIN pg_namespace n ON n.oid = c.relnamespace
+        WHERE n.nspname = :schema AND c.relname = :table
+    """)
+    result = await conn.execute(query, {"schema": schema, "table": table})
+    estimate = result.scalar()
+    if estimate is None or estimate <= 0:
+        return None
+    return estimate
+
+
+async def get_row_count(engine: AsyncEngine, schema: str, table: str, exact: bool = False) -> dict:
+    """Fast count query - doesn't load any data. Uses the planner estimate unless exact is set."""
+    if not _IDENT_RE.match(schema) or not _IDENT_RE.match(table):
         return {"count": 0, "error": "Invalid schema or table name"}
     
-    query = text(f'SELECT COUNT(*) FROM "{schema}"."{table}"')
     async with engine.connect() as conn:
+        if not exact:
+            estimate = await get_approximate_row_count(conn, schema, table)
+            if estimate is not None:
+                return {"count": estimate, "approximate": True}
+        
+        query = text(f'SELECT COUNT(*) FROM {qident(schema)}.{qident(table)}')
         result = await conn.execute(query)
         count = result.scalar()
-    return {"count": count}
+    return {"count": count, "approximate": False}
 
 
 async def get_rows(
@@ -44,39 +101,21 @@ async def get_rows(
     offset: int = 0,
 ) -> dict:
     """Paginated rows - only fetches what's needed"""
-    if not schema.isidentifier() or not table.isidentifier():
+    if not _IDENT_RE.match(schema) or not _IDENT_RE.match(table):
         return {"columns": [], "rows": [], "error": "Invalid schema or table name"}
 
     # Clamp limit to prevent huge fetches
     limit = min(limit, 500)
 
-    query = text(f'SELECT * FROM "{schema}"."{table}" LIMIT :limit OFFSET :offset')
+    select_list = nan_safe_select_list(await get_columns(engine, schema, table))
+    query = text(f'SELECT {select_list} FROM {qident(schema)}.{qident(table)} LIMIT :limit OFFSET :offset')
     async with engine.connect() as conn:
         result = await conn.execute(query, {"limit": limit, "offset": offset})
         columns = list(result.keys())
         rows = result.fetchall()
 
-    # Convert rows to dicts with string serialization for JSON
-    data = []
-    for row in rows:
-        record = {}
-        for i, col in enumerate(columns):
-            val = row[i]
-            # Convert non-JSON-serializable types to string
-            if val is None:
-                record[col] = None
-            elif isinstance(val, float):
-                # Handle NaN and Inf which are not JSON compliant
-                import math
-                if math.isnan(val) or math.isinf(val):
-                    record[col] = None
-                else:
-                    record[col] = val
-            elif isinstance(val, (int, bool, str)):
-                record[col] = val
-            else:
-                record[col] = str(val)
-        data.append(record)
+    # NaN/Inf are already NULL; non-primitive types are handled by RowsJSONResponse
+    data = [dict(zip(columns, row)) for row in rows]
 
     return {
         "columns": columns,
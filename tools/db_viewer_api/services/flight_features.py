@@ -1,9 +1,43 @@
 # file: services/flight_features.py
 import re
-from sqlalchemy import text
-from sqlalchemy.ext.asyncio import AsyncEngine
+from datetime import date
+from typing import AsyncIterator
+from sqlalchemy import TextClause, text
+from sqlalchemy.ext.asyncio import AsyncConnection, AsyncEngine
+from .cache import DATASET_METADATA_TTL, ttl_cache, clear_all as clear_metadata_cache
+from .data import get_approximate_row_count, get_columns, nan_safe_select_list, qident
+from .serialization import ArrowStreamEncoder, arrow_schema, dumps_json, dumps_ndjson_rows
 
+# Rows per server-side cursor fetch when streaming exports
+EXPORT_FETCH_SIZE = 2000
 
+# Rows the export can page through: a NULL flight_key/time_of_track never
+# satisfies the keyset comparison, so exports and their counts skip them
+# (the animation loader drops NULL-key rows anyway)
+_EXPORT_KEY_CONDITION = "flight_key IS NOT NULL AND time_of_track IS NOT NULL"
+
+# Track table lookup straight from pg_class (information_schema is a heavy view).
+# Tables are named like track_cat62_YYYYMM or track_cat62_YYYYMMDD; an exact
+# date match wins over a month match.
+_TRACK_TABLE_SQL = """
+    SELECT c.relname
+    FROM pg_class c
+    JOIN pg_namespace n ON n.oid = c.relnamespace
+    WHERE n.nspname = 'track'
+      AND c.relkind IN ('r', 'p', 'v', 'f')
+      AND (c.relname LIKE :ymd_pattern OR c.relname LIKE :ym_pattern)
+    ORDER BY (c.relname LIKE :ymd_pattern) DESC, c.relname
+    LIMIT 1
+"""
+
+# Sanitizers/validators compiled once - they run on every dataset request
+_DS_SANITIZER = re.compile(r'[^a-zA-Z0-9_]')
+_AP_SANITIZER = re.compile(r'[^a-zA-Z0-9]')
+_DATE_RE = re.compile(r'^\d{4}-\d{2}-\d{2}$', re.ASCII)
+_TABLE_DATE_RE = re.compile(r'(\d{4})(\d{2})(\d{2})$', re.ASCII)
+
+
+@ttl_cache(ttl=300)
 async def get_available_sur_air_dates(engine: AsyncEngine) -> list[dict]:
     """
     Get list of available dates from sur_air schema.
@@ -23,7 +57,7 @@ async def get_available_sur_air_dates(engine: AsyncEngine) -> list[dict]:
     for row in rows:
         table_name = row[0]
         # Extract date from table name like cat062_20240727
-        match = re.search(r'(\d{4})(\d{2})(\d{2})$', table_name)
+        match = _TABLE_DATE_RE.search(table_name)
         if match:
             year, month, day = int(match.group(1)), int(match.group(2)), int(match.group(3))
             date_str = f"{year:04d}-{month:02d}-{day:02d}"
@@ -37,6 +71,7 @@ async def get_available_sur_air_dates(engine: AsyncEngine) -> list[dict]:
     return dates
 
 
+@ttl_cache(ttl=300)
 async def get_sur_air_columns(engine: AsyncEngine, table_name: str) -> list[str]:
     """Get all column names from a sur_air table"""
     query = text("""
@@ -51,6 +86,7 @@ async def get_sur_air_columns(engine: AsyncEngine, table_name: str) -> list[str]
     return [row[0] for row in rows]
 
 
+@ttl_cache(ttl=300)
 async def get_track_columns(engine: AsyncEngine, table_name: str) -> list[str]:
     """Get all column names from a track table, excluding geom"""
     query = text("""
@@ -65,18 +101,21 @@ async def get_track_columns(engine: AsyncEngine, table_name: str) -> list[str]:
     return [row[0] for row in rows]
 
 
+@ttl_cache(ttl=300)
 async def get_airports_for_date(engine: AsyncEngine, date_str: str) -> list[str]:
     """
     Get unique airport codes (dep and dest) from sur_air table for a given date.
     """
+    if not validate_date_format(date_str):
+        return []
     date_compact = date_str.replace('-', '')
     sur_air_table = f"cat062_{date_compact}"
     
     query = text(f"""
         SELECT DISTINCT airport FROM (
-            SELECT dep AS airport FROM sur_air."{sur_air_table}" WHERE dep IS NOT NULL AND dep != ''
+            SELECT dep AS airport FROM sur_air.{qident(sur_air_table)} WHERE dep IS NOT NULL AND dep != ''
             UNION
-            SELECT dest AS airport FROM sur_air."{sur_air_table}" WHERE dest IS NOT NULL AND dest != ''
+            SELECT dest AS airport FROM sur_air.{qident(sur_air_table)} WHERE dest IS NOT NULL AND dest != ''
         ) AS airports
         ORDER BY airport
     """)
@@ -94,58 +133,32 @@ async def get_row_count_for_filter(engine: AsyncEngine, date_str: str, airport_f
     """
     Get row count for a date with optional airport filter.
     """
+    if not validate_date_format(date_str):
+        return {"count": 0, "success": False, "error": "Invalid date format. Use YYYY-MM-DD"}
     date_compact = date_str.replace('-', '')
     sur_air_table = f"cat062_{date_compact}"
     
     where_clause = ""
+    params = {}
     if airport_filter:
-        airport_filter = re.sub(r'[^a-zA-Z0-9]', '', airport_filter).upper()
-        where_clause = f"WHERE (dep = '{airport_filter}' OR dest = '{airport_filter}')"
+        airport_filter = _AP_SANITIZER.sub('', airport_filter).upper()
+        where_clause = "WHERE (dep = :airport OR dest = :airport)"
+        params["airport"] = airport_filter
     
-    query = text(f'SELECT COUNT(*) FROM sur_air."{sur_air_table}" {where_clause}')
+    query = text(f'SELECT COUNT(*) FROM sur_air.{qident(sur_air_table)} {where_clause}')
     
     try:
         async with engine.connect() as conn:
-            result = await conn.execute(query)
+            result = await conn.execute(query, params)
             count = result.scalar()
         return {"count": count, "success": True}
     except Exception as e:
         return {"count": 0, "success": False, "error": str(e)}
 
 
-async def find_track_table_for_date(engine: AsyncEngine, date_str: str) -> str | None:
-    """
-    Find a track table that contains data for the given date.
-    Track tables are named like: track_cat62_YYYYMM or track_cat62_YYYYMMDD
-    """
-    year_month = date_str.replace('-', '')[:6]  # YYYYMM
-    year_month_day = date_str.replace('-', '')  # YYYYMMDD
-    
-    query = text("""
-        SELECT table_name
-        FROM information_schema.tables
-        WHERE table_schema = 'track'
-        ORDER BY table_name
-    """)
-    async with engine.connect() as conn:
-        result = await conn.execute(query)
-        rows = result.fetchall()
-    
-    # Look for exact date match first, then month match
-    for row in rows:
-        table_name = row[0]
-        if year_month_day in table_name:
-            return table_name
-        if year_month in table_name:
-            return table_name
-    
-    return None
-
-
 def validate_date_format(date_str: str) -> bool:
     """Validate date format is YYYY-MM-DD"""
-    pattern = r'^\d{4}-\d{2}-\d{2}$'
-    if not re.match(pattern, date_str):
+    if not _DATE_RE.match(date_str):
         return False
     try:
         year, month, day = map(int, date_str.split('-'))
@@ -156,10 +169,29 @@ def validate_date_format(date_str: str) -> bool:
         return False
 
 
-async def ensure_schema_exists(engine: AsyncEngine, schema_name: str = "flight_features"):
+async def ensure_schema_exists(conn: AsyncConnection, schema_name: str = "flight_features"):
     """Create the flight_features schema if it doesn't exist"""
-    async with engine.begin() as conn:
-        await conn.execute(text(f'CREATE SCHEMA IF NOT EXISTS "{schema_name}"'))
+    await conn.execute(text(f'CREATE SCHEMA IF NOT EXISTS {qident(schema_name)}'))
+
+
+async def _resolve_source_tables(conn: AsyncConnection, sur_air_table: str, date_compact: str) -> tuple[bool, str | None]:
+    """
+    Check the sur_air table exists and find the matching track table in one
+    round-trip. Track tables are named like track_cat62_YYYYMM or
+    track_cat62_YYYYMMDD (exact date match preferred over month match)
+    """
+    query = text(f"""
+        SELECT
+            to_regclass('sur_air.' || quote_ident(:sur_air_table)) IS NOT NULL,
+            ({_TRACK_TABLE_SQL})
+    """)
+    result = await conn.execute(query, {
+        "sur_air_table": sur_air_table,
+        "ymd_pattern": f"%{date_compact}%",
+        "ym_pattern": f"%{date_compact[:6]}%",
+    })
+    sur_air_found, track_table = result.one()
+    return sur_air_found, track_table
 
 
 async def create_flight_feature_dataset(
@@ -189,36 +221,16 @@ async def create_flight_feature_dataset(
             dataset_name += f"_{airport_filter.upper()}"
     
     # Sanitize dataset name for SQL
-    dataset_name = re.sub(r'[^a-zA-Z0-9_]', '_', dataset_name)
+    dataset_name = _DS_SANITIZER.sub('_', dataset_name)
     
     # Sanitize airport filter
     if airport_filter:
-        airport_filter = re.sub(r'[^a-zA-Z0-9]', '', airport_filter).upper()
+        airport_filter = _AP_SANITIZER.sub('', airport_filter).upper()
     
     try:
         # Find the sur_air table for this date
         sur_air_table = f"cat062_{date_compact}"
         
-        # Check if sur_air table exists
-        check_query = text("""
-            SELECT 1 FROM information_schema.tables 
-            WHERE table_schema = 'sur_air' AND table_name = :table_name
-        """)
-        async with engine.connect() as conn:
-            result = await conn.execute(check_query, {"table_name": sur_air_table})
-            if not result.fetchone():
-                return {"success": False, "error": f"sur_air table not found: {sur_air_table}"}
-        
-        # Find matching track table
-        track_table = await find_track_table_for_date(engine, date_str)
-        
-        # Ensure output schema exists
-        await ensure_schema_exists(engine)
-        
-        # Drop existing table first
-        async with engine.begin() as conn:
-            await conn.execute(text(f'DROP TABLE IF EXISTS flight_features."{dataset_name}"'))
-        
         # Build query - LEFT JOIN sur_air with track filtered by date
         # Only include specific columns as per README
         selected_cols = """
@@ -245,47 +257,70 @@ async def create_flight_feature_dataset(
             s.flight_key
         """
         
-        # Build WHERE clause for airport filter
+        # Build WHERE clause for airport filter - values are bound, only identifiers are interpolated
         airport_where = ""
+        create_params = {}
         if airport_filter:
-            airport_where = f"WHERE (s.dep = '{airport_filter}' OR s.dest = '{airport_filter}')"
+            airport_where = "WHERE (s.dep = :airport OR s.dest = :airport)"
+            create_params["airport"] = airport_filter
         
-        if track_table:
-            create_sql = f"""
-                CREATE TABLE flight_features."{dataset_name}" AS
-                SELECT {selected_cols}
-                FROM sur_air."{sur_air_table}" s
-                LEFT JOIN track."{track_table}" t 
-                    ON s.flight_key = t.flight_key 
-                    AND DATE(t.start_time) = '{date_str}'
-                {airport_where}
-                ORDER BY s.flight_key ASC, s.time_of_track ASC
-            """
-        else:
-            # No track table found, just copy sur_air data with selected columns
-            create_sql = f"""
-                CREATE TABLE flight_features."{dataset_name}" AS
-                SELECT {selected_cols}
-                FROM sur_air."{sur_air_table}" s
-                {airport_where}
-                ORDER BY s.flight_key ASC, s.time_of_track ASC
-            """
+        # Indexes for the export read path: btree on (flight_key, time_of_track)
+        # serves the ordered keyset pagination, (dep, dest, flight_key, time_of_track)
+        # serves dep filters and gives dep+dest exports an ordered scan with no sort,
+        # dest serves dest-only filters
+        # (index names are left to PostgreSQL so long dataset names can't collide)
+        index_sqls = [
+            f'CREATE INDEX ON flight_features.{qident(dataset_name)} USING btree (flight_key, time_of_track)',
+            f'CREATE INDEX ON flight_features.{qident(dataset_name)} USING btree (dep, dest, flight_key, time_of_track)',
+            f'CREATE INDEX ON flight_features.{qident(dataset_name)} USING btree (dest)',
+        ]
         
+        # The whole build - source lookup, schema create, drop, create, indexing
+        # and count - runs on one connection in a single transaction
+        count_query = text(f'SELECT COUNT(*) FROM flight_features.{qident(dataset_name)}')
         async with engine.begin() as conn:
-            await conn.execute(text(create_sql))
-        
-        # Get row count of created table
-        count_query = text(f'SELECT COUNT(*) FROM flight_features."{dataset_name}"')
-        async with engine.connect() as conn:
+            sur_air_found, track_table = await _resolve_source_tables(conn, sur_air_table, date_compact)
+            if not sur_air_found:
+                return {"success": False, "error": f"sur_air table not found: {sur_air_table}"}
+            
+            if track_table:
+                create_params["track_date"] = date.fromisoformat(date_str)
+                create_sql = f"""
+                    CREATE TABLE flight_features.{qident(dataset_name)} AS
+                    SELECT {selected_cols}
+                    FROM sur_air.{qident(sur_air_table)} s
+                    LEFT JOIN track.{qident(track_table)} t 
+                        ON s.flight_key = t.flight_key 
+                        AND DATE(t.start_time) = :track_date
+                    {airport_where}
+                    ORDER BY s.flight_key ASC, s.time_of_track ASC
+                """
+            else:
+                # No track table found, just copy sur_air data with selected columns
+                create_sql = f"""
+                    CREATE TABLE flight_features.{qident(dataset_name)} AS
+                    SELECT {selected_cols}
+                    FROM sur_air.{qident(sur_air_table)} s
+                    {airport_where}
+                    ORDER BY s.flight_key ASC, s.time_of_track ASC
+                """
+            
+            await ensure_schema_exists(conn)
+            await conn.execute(text(f'DROP TABLE IF EXISTS flight_features.{qident(dataset_name)}'))
+            await conn.execute(text(create_sql), create_params)
+            for index_sql in index_sqls:
+                await conn.execute(text(index_sql))
+            await conn.execute(text(f'ANALYZE flight_features.{qident(dataset_name)}'))
             result = await conn.execute(count_query)
             row_count = result.scalar()
         
-        # Generate parquet and upload to R2 immediately
-        from . import parquet_export
-        parquet_result = await parquet_export.generate_parquet(engine, dataset_name)
+        # New table in flight_features - cached catalog lookups are stale now
+        clear_metadata_cache()
         
-        r2_url = parquet_result.get("r2_url")
-        parquet_size_mb = parquet_result.get("size_mb")
+        # Generate parquet and upload to R2 in the background - poll
+        # /flight-features/parquet/status with the job ID
+        from .parquet_jobs import start_parquet_job
+        parquet_job_id = start_parquet_job(engine, dataset_name)
         
         return {
             "success": True,
@@ -296,14 +331,14 @@ async def create_flight_feature_dataset(
             "date": date_str,
             "sur_air_table": sur_air_table,
             "track_table": track_table,
-            "r2_url": r2_url,
-            "parquet_size_mb": parquet_size_mb,
+            "parquet_job_id": parquet_job_id,
         }
         
     except Exception as e:
         return {"success": False, "error": str(e)}
 
 
+@ttl_cache(ttl=DATASET_METADATA_TTL)
 async def list_flight_feature_datasets(engine: AsyncEngine) -> list[dict]:
     """List all datasets in the flight_features schema"""
     query = text("""
@@ -321,11 +356,12 @@ async def list_flight_feature_datasets(engine: AsyncEngine) -> list[dict]:
 async def delete_flight_feature_dataset(engine: AsyncEngine, dataset_name: str) -> dict:
     """Delete a dataset from flight_features schema"""
     # Sanitize name
-    dataset_name = re.sub(r'[^a-zA-Z0-9_]', '_', dataset_name)
+    dataset_name = _DS_SANITIZER.sub('_', dataset_name)
     
     try:
         async with engine.begin() as conn:
-            await conn.execute(text(f'DROP TABLE IF EXISTS flight_features."{dataset_name}"'))
+            await conn.execute(text(f'DROP TABLE IF EXISTS flight_features.{qident(dataset_name)}'))
+        clear_metadata_cache()
         return {"success": True, "deleted": dataset_name}
     except Exception as e:
         return {"success": False, "error": str(e)}
@@ -338,35 +374,19 @@ async def export_dataset_preview(
     offset: int = 0,
 ) -> dict:
     """Get preview rows from a flight feature dataset"""
-    dataset_name = re.sub(r'[^a-zA-Z0-9_]', '_', dataset_name)
+    dataset_name = _DS_SANITIZER.sub('_', dataset_name)
     limit = min(limit, 500)
     
     try:
-        query = text(f'SELECT * FROM flight_features."{dataset_name}" LIMIT :limit OFFSET :offset')
+        select_list = nan_safe_select_list(await get_columns(engine, "flight_features", dataset_name))
+        query = text(f'SELECT {select_list} FROM flight_features.{qident(dataset_name)} LIMIT :limit OFFSET :offset')
         async with engine.connect() as conn:
             result = await conn.execute(query, {"limit": limit, "offset": offset})
             columns = list(result.keys())
             rows = result.fetchall()
         
-        # Convert to JSON-safe format
-        data = []
-        for row in rows:
-            record = {}
-            for i, col in enumerate(columns):
-                val = row[i]
-                if val is None:
-                    record[col] = None
-                elif isinstance(val, float):
-                    import math
-                    if math.isnan(val) or math.isinf(val):
-                        record[col] = None
-                    else:
-                        record[col] = val
-                elif isinstance(val, (int, bool, str)):
-                    record[col] = val
-                else:
-                    record[col] = str(val)
-            data.append(record)
+        # NaN/Inf are already NULL; non-primitive types are handled by RowsJSONResponse
+        data = [dict(zip(columns, row)) for row in rows]
         
         return {
             "columns": columns,
@@ -378,21 +398,49 @@ async def export_dataset_preview(
         return {"columns": [], "rows": [], "error": str(e)}
 
 
+async def export_dataset_preview_arrow(
+    engine: AsyncEngine,
+    dataset_name: str,
+    limit: int = 100,
+    offset: int = 0,
+) -> bytes:
+    """Get preview rows from a flight feature dataset as Arrow IPC stream bytes"""
+    dataset_name = _DS_SANITIZER.sub('_', dataset_name)
+    limit = min(limit, 500)
+    
+    dataset_columns = await get_columns(engine, "flight_features", dataset_name)
+    if not dataset_columns:
+        raise ValueError(f"Dataset not found: {dataset_name}")
+    select_list = nan_safe_select_list(dataset_columns)
+    query = text(f'SELECT {select_list} FROM flight_features.{qident(dataset_name)} LIMIT :limit OFFSET :offset')
+    async with engine.connect() as conn:
+        result = await conn.execute(query, {"limit": limit, "offset": offset})
+        columns = list(result.keys())
+        rows = result.fetchall()
+    
+    encoder = ArrowStreamEncoder(arrow_schema(columns, await _column_types(engine, dataset_name)))
+    return encoder.write(rows) + encoder.close()
+
+
 async def get_airport_codes(engine: AsyncEngine, dataset_name: str) -> dict:
     """Get unique airport codes (dep/dest) from a dataset"""
-    dataset_name = re.sub(r'[^a-zA-Z0-9_]', '_', dataset_name)
+    dataset_name = _DS_SANITIZER.sub('_', dataset_name)
     
     try:
-        # Get unique dep codes
-        dep_query = text(f'SELECT DISTINCT dep FROM flight_features."{dataset_name}" WHERE dep IS NOT NULL AND dep != \'\' ORDER BY dep')
-        dest_query = text(f'SELECT DISTINCT dest FROM flight_features."{dataset_name}" WHERE dest IS NOT NULL AND dest != \'\' ORDER BY dest')
+        # Unique dep and dest codes in a single pass over the table
+        query = text(f"""
+            SELECT
+                array_agg(DISTINCT dep ORDER BY dep) FILTER (WHERE dep IS NOT NULL AND dep != ''),
+                array_agg(DISTINCT dest ORDER BY dest) FILTER (WHERE dest IS NOT NULL AND dest != '')
+            FROM flight_features.{qident(dataset_name)}
+        """)
         
         async with engine.connect() as conn:
-            dep_result = await conn.execute(dep_query)
-            dest_result = await conn.execute(dest_query)
-            
-            dep_codes = [row[0] for row in dep_result.fetchall()]
-            dest_codes = [row[0] for row in dest_result.fetchall()]
+            result = await conn.execute(query)
+            dep_codes, dest_codes = result.one()
+        
+        dep_codes = dep_codes or []
+        dest_codes = dest_codes or []
         
         return {
             "dep_codes": dep_codes,
@@ -407,12 +455,21 @@ async def get_dataset_row_count(
     dataset_name: str,
     dep_filter: str | None = None,
     dest_filter: str | None = None,
+    exact: bool = False,
 ) -> dict:
-    """Get row count for a dataset with optional filters"""
-    dataset_name = re.sub(r'[^a-zA-Z0-9_]', '_', dataset_name)
+    """Get row count for a dataset with optional filters.
+    Unfiltered counts use the planner estimate unless exact is set; exact
+    counts match the export and leave out NULL-key rows."""
+    dataset_name = _DS_SANITIZER.sub('_', dataset_name)
     
     try:
-        conditions = []
+        if not dep_filter and not dest_filter and not exact:
+            async with engine.connect() as conn:
+                estimate = await get_approximate_row_count(conn, "flight_features", dataset_name)
+            if estimate is not None:
+                return {"count": estimate, "approximate": True}
+        
+        conditions = [_EXPORT_KEY_CONDITION]
         params = {}
         
         if dep_filter:
@@ -422,19 +479,84 @@ async def get_dataset_row_count(
             conditions.append("dest = :dest")
             params["dest"] = dest_filter
         
-        where_clause = "WHERE " + " AND ".join(conditions) if conditions else ""
+        where_clause = "WHERE " + " AND ".join(conditions)
         
-        query = text(f'SELECT COUNT(*) FROM flight_features."{dataset_name}" {where_clause}')
+        query = text(f'SELECT COUNT(*) FROM flight_features.{qident(dataset_name)} {where_clause}')
         
         async with engine.connect() as conn:
             result = await conn.execute(query, params)
             count = result.scalar()
         
-        return {"count": count}
+        return {"count": count, "approximate": False}
     except Exception as e:
         return {"count": 0, "error": str(e)}
 
 
+async def _column_types(engine: AsyncEngine, dataset_name: str) -> dict[str, str]:
+    """Column name -> PostgreSQL data type for a dataset (cached catalog lookup)"""
+    return {
+        col["column_name"]: col["data_type"]
+        for col in await get_columns(engine, "flight_features", dataset_name)
+    }
+
+
+async def _build_export_query(
+    engine: AsyncEngine,
+    dataset_name: str,
+    dep_filter: str | None,
+    dest_filter: str | None,
+    limit: int | None,
+    offset: int,
+    batch_size: int,
+    after_flight_key: str | None,
+    after_time_of_track: str | None,
+) -> tuple[TextClause, dict, int, int]:
+    """Build the filtered export query, returns (query, params, actual_limit, offset)"""
+    # Build WHERE clause
+    conditions = [_EXPORT_KEY_CONDITION]
+    params = {}
+    
+    if dep_filter:
+        conditions.append("dep = :dep")
+        params["dep"] = dep_filter
+    if dest_filter:
+        conditions.append("dest = :dest")
+        params["dest"] = dest_filter
+    
+    keyset = after_flight_key is not None and after_time_of_track is not None
+    if keyset:
+        # Cursor values arrive as text - cast them to the column types so the
+        # row comparison can use the (flight_key, time_of_track) btree
+        column_types = await _column_types(engine, dataset_name)
+        if 'flight_key' not in column_types or 'time_of_track' not in column_types:
+            raise ValueError(f"Dataset not found or has no flight_key/time_of_track: {dataset_name}")
+        conditions.append(
+            "(flight_key, time_of_track) > ("
+            f"CAST(CAST(:after_flight_key AS text) AS {column_types['flight_key']}), "
+            f"CAST(CAST(:after_time_of_track AS text) AS {column_types['time_of_track']}))"
+        )
+        params["after_flight_key"] = after_flight_key
+        params["after_time_of_track"] = after_time_of_track
+        offset = 0
+    
+    where_clause = "WHERE " + " AND ".join(conditions)
+    
+    # Use batch_size for pagination, limit overrides if smaller
+    actual_limit = batch_size
+    if limit and limit < batch_size:
+        actual_limit = limit
+    
+    params["limit"] = actual_limit
+    
+    select_list = nan_safe_select_list(await get_columns(engine, "flight_features", dataset_name))
+    query_sql = f'SELECT {select_list} FROM flight_features.{qident(dataset_name)} {where_clause} ORDER BY flight_key, time_of_track LIMIT :limit'
+    if not keyset:
+        query_sql += " OFFSET :offset"
+        params["offset"] = offset
+    
+    return text(query_sql), params, actual_limit, offset
+
+
 async def export_dataset_filtered(
     engine: AsyncEngine,
     dataset_name: str,
@@ -443,71 +565,126 @@ async def export_dataset_filtered(
     limit: int | None = None,
     offset: int = 0,
     batch_size: int = 50000,
-) -> dict:
+    after_flight_key: str | None = None,
+    after_time_of_track: str | None = None,
+) -> AsyncIterator[bytes]:
     """Export dataset filtered by airport codes for use in flight animation.
-    Supports pagination with offset and batch_size for large datasets.
+    Supports pagination for large datasets: pass the previous batch's
+    next_cursor as after_flight_key/after_time_of_track (keyset, cost doesn't
+    grow with position), or fall back to offset.
+    
+    Streams NDJSON: a header line with columns/offset/batch_size/filters, one
+    line per row, then a footer line with row_count/has_more/next_cursor (or an
+    error line). Rows are read through a server-side cursor so only one fetch
+    chunk is held in memory at a time.
     """
-    dataset_name = re.sub(r'[^a-zA-Z0-9_]', '_', dataset_name)
+    dataset_name = _DS_SANITIZER.sub('_', dataset_name)
     
     try:
-        # Build WHERE clause
-        conditions = []
-        params = {}
-        
-        if dep_filter:
-            conditions.append("dep = :dep")
-            params["dep"] = dep_filter
-        if dest_filter:
-            conditions.append("dest = :dest")
-            params["dest"] = dest_filter
-        
-        where_clause = ""
-        if conditions:
-            where_clause = "WHERE " + " AND ".join(conditions)
-        
-        # Use batch_size for pagination, limit overrides if smaller
-        actual_limit = batch_size
-        if limit and limit < batch_size:
-            actual_limit = limit
-        
-        params["limit"] = actual_limit
-        params["offset"] = offset
-        
-        query = text(f'SELECT * FROM flight_features."{dataset_name}" {where_clause} ORDER BY flight_key, time_of_track LIMIT :limit OFFSET :offset')
+        query, params, actual_limit, offset = await _build_export_query(
+            engine, dataset_name, dep_filter, dest_filter,
+            limit, offset, batch_size, after_flight_key, after_time_of_track,
+        )
         
+        row_count = 0
+        last_row = None
         async with engine.connect() as conn:
-            result = await conn.execute(query, params)
+            result = await conn.stream(query.execution_options(yield_per=EXPORT_FETCH_SIZE), params)
             columns = list(result.keys())
-            rows = result.fetchall()
+            key_index = columns.index("flight_key")
+            time_index = columns.index("time_of_track")
+            yield dumps_json({
+                "columns": columns,
+                "offset": offset,
+                "batch_size": actual_limit,
+                "filters": {"dep": dep_filter, "dest": dest_filter},
+            }) + b"\n"
+            
+            async for partition in result.partitions(EXPORT_FETCH_SIZE):
+                row_count += len(partition)
+                last_row = partition[-1]
+                yield dumps_ndjson_rows(columns, partition)
         
-        # Convert to JSON-safe format
-        import math
-        data = []
-        for row in rows:
-            record = {}
-            for i, col in enumerate(columns):
-                val = row[i]
-                if val is None:
-                    record[col] = None
-                elif isinstance(val, float):
-                    if math.isnan(val) or math.isinf(val):
-                        record[col] = None
-                    else:
-                        record[col] = val
-                elif isinstance(val, (int, bool, str)):
-                    record[col] = val
-                else:
-                    record[col] = str(val)
-            data.append(record)
+        has_more = row_count == actual_limit
+        next_cursor = None
+        if has_more and last_row is not None:
+            next_cursor = {
+                "after_flight_key": last_row[key_index],
+                "after_time_of_track": last_row[time_index],
+            }
         
-        return {
-            "columns": columns,
-            "rows": data,
-            "row_count": len(data),
-            "offset": offset,
-            "batch_size": actual_limit,
-            "has_more": len(data) == actual_limit,
-            "filters": {"dep": dep_filter, "dest": dest_filter},
-        }
+        yield dumps_json({
+            "row_count": row_count,
+            "has_more": has_more,
+            "next_cursor": next_cursor,
+        }) + b"\n"
     except Exception as e:
-        return {"columns": [], "rows": [], "error": str(e)}
+        yield dumps_json({"error": str(e)}) + b"\n"
+
+
+async def _export_dataset_filtered_arrow(
+    engine: AsyncEngine,
+    dataset_name: str,
+    dep_filter: str | None,
+    dest_filter: str | None,
+    limit: int | None,
+    offset: int,
+    batch_size: int,
+    after_flight_key: str | None,
+    after_time_of_track: str | None,
+) -> AsyncIterator[bytes]:
+    """Arrow export generator - yields the schema message once the query is running"""
+    column_types = await _column_types(engine, dataset_name)
+    if not column_types:
+        raise ValueError(f"Dataset not found: {dataset_name}")
+    query, params, _, _ = await _build_export_query(
+        engine, dataset_name, dep_filter, dest_filter,
+        limit, offset, batch_size, after_flight_key, after_time_of_track,
+    )
+    
+    async with engine.connect() as conn:
+        result = await conn.stream(query.execution_options(yield_per=EXPORT_FETCH_SIZE), params)
+        encoder = ArrowStreamEncoder(arrow_schema(list(result.keys()), column_types))
+        yield encoder.start()
+        try:
+            async for partition in result.partitions(EXPORT_FETCH_SIZE):
+                yield encoder.write(partition)
+        except Exception as e:
+            # Headers are already sent - the client sees a truncated stream
+            print(f"Error exporting {dataset_name} as Arrow: {e}")
+            return
+    
+    yield encoder.close()
+
+
+async def export_dataset_filtered_arrow(
+    engine: AsyncEngine,
+    dataset_name: str,
+    dep_filter: str | None = None,
+    dest_filter: str | None = None,
+    limit: int | None = None,
+    offset: int = 0,
+    batch_size: int = 50000,
+    after_flight_key: str | None = None,
+    after_time_of_track: str | None = None,
+) -> AsyncIterator[bytes]:
+    """Same export as export_dataset_filtered, streamed as an Arrow IPC stream.
+    One record batch is written per server-side cursor fetch. The next keyset
+    cursor is simply the last row's (flight_key, time_of_track).
+    
+    The query is run before this returns, so a missing dataset, bad cursor or
+    SQL error raises here while the caller can still send an error response.
+    """
+    dataset_name = _DS_SANITIZER.sub('_', dataset_name)
+    stream = _export_dataset_filtered_arrow(
+        engine, dataset_name, dep_filter, dest_filter,
+        limit, offset, batch_size, after_flight_key, after_time_of_track,
+    )
+    header = await anext(stream)
+    
+    async def chunks() -> AsyncIterator[bytes]:
+        yield header
+        async for chunk in stream:
+            yield chunk
+    
+    return chunks()
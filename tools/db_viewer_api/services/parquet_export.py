@@ -4,14 +4,62 @@ Parquet export service for flight feature datasets.
 Exports PostgreSQL data to Parquet files for fast frontend loading.
 Uploads to Cloudflare R2 for CDN-backed downloads.
 """
+import asyncio
 import os
 import re
-import pandas as pd
+from concurrent.futures import ThreadPoolExecutor
 import pyarrow as pa
+import pyarrow.csv as pa_csv
 import pyarrow.parquet as pq
 from sqlalchemy import text
 from sqlalchemy.ext.asyncio import AsyncEngine
-from .r2_storage import upload_parquet_to_r2, check_parquet_exists_in_r2, get_parquet_public_url
+from .data import get_columns, nan_safe_select_list, qident
+from .r2_storage import upload_parquet_to_r2, upload_parquet_fileobj_to_r2, check_parquet_exists_in_r2, get_parquet_public_url
+from .serialization import arrow_schema
+
+# Low-cardinality string columns worth dictionary-encoding
+PARQUET_DICTIONARY_COLUMNS = ['dep', 'dest', 'acid', 'sector']
+
+# Columns the frontend's DuckDB loader reads - the rest of the dataset is not exported
+PARQUET_COLUMNS = [
+    'flight_key', 'time_of_track', 'latitude', 'longitude', 'measured_fl',
+    'acid', 'dep', 'dest', 'ias_dap', 'mag_heading_dap', 'rate_cd', 'vert',
+]
+
+# Each row group is sorted by these in Arrow instead of an ORDER BY in PostgreSQL
+PARQUET_SORT_KEYS = [('flight_key', 'ascending'), ('time_of_track', 'ascending')]
+
+# Dictionary-encoded columns left uncompressed - tiny dictionaries and RLE
+# indices over sorted data gain next to nothing from zstd
+PARQUET_UNCOMPRESSED_COLUMNS = ['dep', 'dest']
+
+# Columns that get min/max statistics - the sort key and filter columns
+PARQUET_STATISTICS_COLUMNS = ['flight_key', 'time_of_track', 'dep', 'dest']
+
+# Bytes of COPY output decoded per batch
+PARQUET_CSV_BLOCK_SIZE = 64 << 20
+
+# Default rows per Parquet row group - decoded batches are buffered up to this
+# size. Smaller groups give DuckDB WASM finer min/max pruning and smaller reads
+PARQUET_ROW_GROUP_SIZE = 250_000
+
+# Exports running at once per worker. Each one pins a converter thread for its
+# whole duration and a pipe-writer thread while the converter catches up, so
+# both get dedicated pools of this size - a busy export can never occupy
+# asyncio's default executor (which the R2 helpers use), and the semaphore
+# keeps running exports within the pools so a pipe always has its reader
+PARQUET_EXPORT_CONCURRENCY = int(os.getenv("PARQUET_EXPORT_CONCURRENCY", "4"))
+_converter_pool = ThreadPoolExecutor(PARQUET_EXPORT_CONCURRENCY, thread_name_prefix="parquet-convert")
+_pipe_writer_pool = ThreadPoolExecutor(PARQUET_EXPORT_CONCURRENCY, thread_name_prefix="parquet-pipe")
+_export_slots = asyncio.Semaphore(PARQUET_EXPORT_CONCURRENCY)
+
+# Keep a local copy of every export. With PARQUET_LOCAL_CACHE=0 exports are
+# built in memory and uploaded straight to R2 - a local file is only written
+# if the upload fails
+PARQUET_LOCAL_CACHE = os.getenv("PARQUET_LOCAL_CACHE", "1") == "1"
+
+# Precompiled - runs on every parquet endpoint call
+_NAME_SANITIZER = re.compile(r'[^a-zA-Z0-9_]')
 
 # Directory for parquet files (local cache)
 PARQUET_DIR = os.path.join(os.path.dirname(os.path.dirname(__file__)), "data", "parquet")
@@ -20,12 +68,13 @@ os.makedirs(PARQUET_DIR, exist_ok=True)
 
 def get_parquet_key(dataset: str, dep: str = None, dest: str = None) -> str:
     """Get the R2 object key (filename) for a parquet file"""
-    dataset_safe = re.sub(r'[^a-zA-Z0-9_]', '_', dataset)
+    dataset_safe = _NAME_SANITIZER.sub('_', dataset)
     filename = dataset_safe
+    # Filter values end up in a local path and object key - keep them to safe characters
     if dep:
-        filename += f"_dep_{dep}"
+        filename += f"_dep_{_NAME_SANITIZER.sub('_', dep)}"
     if dest:
-        filename += f"_dest_{dest}"
+        filename += f"_dest_{_NAME_SANITIZER.sub('_', dest)}"
     filename += ".parquet"
     return filename
 
@@ -36,13 +85,13 @@ def get_parquet_path(dataset: str, dep: str = None, dest: str = None) -> str:
     return os.path.join(PARQUET_DIR, filename)
 
 
-def parquet_exists(dataset: str, dep: str = None, dest: str = None) -> dict:
+async def parquet_exists(dataset: str, dep: str = None, dest: str = None) -> dict:
     """Check if parquet file exists in R2 or locally and return info"""
     object_key = get_parquet_key(dataset, dep, dest)
     path = get_parquet_path(dataset, dep, dest)
     
     # First check R2
-    if check_parquet_exists_in_r2(object_key):
+    if await check_parquet_exists_in_r2(object_key):
         r2_url = get_parquet_public_url(object_key)
         return {
             "exists": True,
@@ -66,99 +115,241 @@ def parquet_exists(dataset: str, dep: str = None, dest: str = None) -> dict:
     return {"exists": False, "path": path}
 
 
+def _write_parquet_from_csv(source, sink, schema: pa.Schema, row_group_size: int) -> int:
+    """
+    Convert a COPY ... (FORMAT csv) stream (path or file object) to Parquet
+    batch by batch, written to sink (path or output stream). Returns row count.
+    """
+    try:
+        reader = pa_csv.open_csv(
+            source,
+            # Large blocks so each decoded batch makes a reasonably sized row group
+            read_options=pa_csv.ReadOptions(column_names=schema.names, block_size=PARQUET_CSV_BLOCK_SIZE),
+            convert_options=pa_csv.ConvertOptions(
+                column_types=schema,
+                # COPY writes NULL as an unquoted empty field and '' as ""
+                null_values=[""],
+                strings_can_be_null=True,
+                quoted_strings_can_be_null=False,
+                # COPY writes booleans as t/f
+                true_values=["t"],
+                false_values=["f"],
+            ),
+        )
+    except pa.ArrowInvalid as e:
+        # COPY of an empty result writes nothing at all - no rows, no file
+        if str(e) == "Empty CSV file":
+            return 0
+        raise
+    dictionary_cols = [col for col in PARQUET_DICTIONARY_COLUMNS if col in schema.names]
+    
+    # Delta-encode integers/timestamps (sorted flight_key, monotone time_of_track)
+    # and byte-split floats (coordinates, speeds) - both compress far better under zstd
+    column_encoding = {}
+    for field in schema:
+        if field.name in dictionary_cols:
+            continue
+        if pa.types.is_integer(field.type) or pa.types.is_timestamp(field.type):
+            column_encoding[field.name] = 'DELTA_BINARY_PACKED'
+        elif pa.types.is_floating(field.type):
+            column_encoding[field.name] = 'BYTE_STREAM_SPLIT'
+    
+    uncompressed_cols = [col for col in PARQUET_UNCOMPRESSED_COLUMNS if col in dictionary_cols]
+    compression = {name: 'none' if name in uncompressed_cols else 'zstd' for name in schema.names}
+    compression_level = {name: 3 for name in schema.names if name not in uncompressed_cols}
+    
+    # Sort keys the export actually has; recorded as sorting_columns metadata
+    sort_keys = [key for key in PARQUET_SORT_KEYS if key[0] in schema.names]
+    sorting_columns = pq.SortingColumn.from_ordering(schema, sort_keys) if sort_keys else None
+    
+    def write_row_group(table: pa.Table) -> None:
+        writer.write_table(table.sort_by(sort_keys) if sort_keys else table, row_group_size=row_group_size)
+    
+    row_count = 0
+    pending = []
+    # zstd writes close to snappy speed at gzip-like sizes (DuckDB WASM reads it)
+    with pq.ParquetWriter(
+        sink,
+        schema,
+        compression=compression,
+        compression_level=compression_level,
+        version='2.6',
+        data_page_version='2.0',
+        use_dictionary=dictionary_cols,
+        column_encoding=column_encoding,
+        data_page_size=1 << 20,
+        write_statistics=[col for col in PARQUET_STATISTICS_COLUMNS if col in schema.names],
+        sorting_columns=sorting_columns,
+    ) as writer:
+        for batch in reader:
+            pending.append(batch)
+            row_count += batch.num_rows
+            table = pa.Table.from_batches(pending, schema)
+            if table.num_rows >= row_group_size:
+                # Write only full row groups and carry the remainder over
+                full_rows = table.num_rows - table.num_rows % row_group_size
+                for offset in range(0, full_rows, row_group_size):
+                    write_row_group(table.slice(offset, row_group_size))
+                pending = table.slice(full_rows).to_batches()
+        if pending:
+            write_row_group(pa.Table.from_batches(pending, schema))
+    return row_count
+
+
+def _write_all(fd: int, data: bytes) -> None:
+    """os.write until the whole chunk is in the pipe"""
+    view = memoryview(data)
+    while view:
+        view = view[os.write(fd, view):]
+
+
+async def _copy_to_parquet(engine: AsyncEngine, query: str, args: list, sink, schema: pa.Schema, row_group_size: int) -> int:
+    """
+    Stream COPY output through a pipe into the Parquet writer thread, so the
+    PostgreSQL fetch and the CSV decode/compression overlap. Returns row count.
+    """
+    async with _export_slots:
+        loop = asyncio.get_running_loop()
+        read_fd, write_fd = os.pipe()
+        
+        def convert() -> int:
+            # Closing the read end on failure makes the COPY side fail fast with EPIPE
+            with open(read_fd, 'rb') as source:
+                return _write_parquet_from_csv(source, sink, schema, row_group_size)
+        
+        async def feed(chunk: bytes) -> None:
+            # Pipe writes block once the reader falls behind - keep them off the event loop
+            await loop.run_in_executor(_pipe_writer_pool, _write_all, write_fd, chunk)
+        
+        convert_future = loop.run_in_executor(_converter_pool, convert)
+        copy_error = None
+        try:
+            async with engine.connect() as conn:
+                raw_conn = await conn.get_raw_connection()
+                await raw_conn.driver_connection.copy_from_query(query, *args, output=feed, format='csv')
+        except Exception as e:
+            copy_error = e
+        finally:
+            # EOF for the reader
+            os.close(write_fd)
+        
+        try:
+            row_count = await convert_future
+        except Exception:
+            # A writer failure is what breaks the pipe (the COPY side only sees
+            # EPIPE); otherwise the COPY/connection error is the real cause
+            if copy_error is None or isinstance(copy_error, BrokenPipeError):
+                raise
+            raise copy_error
+        if copy_error is not None:
+            raise copy_error
+        return row_count
+
+
+async def _copy_to_parquet_file(engine: AsyncEngine, query: str, args: list, parquet_path: str, schema: pa.Schema, row_group_size: int) -> int:
+    """_copy_to_parquet into a file, written under a temp name so a failed export never looks cached"""
+    tmp_path = parquet_path + ".tmp"
+    try:
+        row_count = await _copy_to_parquet(engine, query, args, tmp_path, schema, row_group_size)
+        if row_count:
+            os.replace(tmp_path, parquet_path)
+        return row_count
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+
 async def generate_parquet(
     engine: AsyncEngine,
     dataset: str,
     dep: str = None,
     dest: str = None,
-    force: bool = False
+    force: bool = False,
+    columns: list[str] | None = None,
+    row_group_size: int = PARQUET_ROW_GROUP_SIZE,
 ) -> dict:
     """
     Generate a Parquet file from a flight feature dataset.
-    Uses pandas to read from PostgreSQL and write to Parquet.
+    Streams the rows out of PostgreSQL with COPY and converts them with pyarrow.
+    Only `columns` (default PARQUET_COLUMNS) are exported; names the dataset
+    doesn't have are skipped, and if none match every column is exported.
     """
-    dataset_safe = re.sub(r'[^a-zA-Z0-9_]', '_', dataset)
+    if row_group_size < 1:
+        return {"success": False, "error": "row_group_size must be positive"}
+    
+    dataset_safe = _NAME_SANITIZER.sub('_', dataset)
     parquet_path = get_parquet_path(dataset, dep, dest)
     
-    # Check if already exists
-    if not force and os.path.exists(parquet_path):
-        info = parquet_exists(dataset, dep, dest)
-        return {
-            "success": True,
-            "cached": True,
-            **info
-        }
+    # Check if already exists - without the local cache the R2 copy is the cache
+    if not force and (os.path.exists(parquet_path) or not PARQUET_LOCAL_CACHE):
+        info = await parquet_exists(dataset, dep, dest)
+        if info["exists"]:
+            return {
+                "success": True,
+                "cached": True,
+                **info
+            }
     
     # Build query with filters
+    # Filter values are bound as $n arguments, never interpolated
     conditions = []
+    args = []
     if dep:
-        conditions.append(f"dep = '{dep}'")
+        args.append(dep)
+        conditions.append(f"dep = ${len(args)}")
     if dest:
-        conditions.append(f"dest = '{dest}'")
+        args.append(dest)
+        conditions.append(f"dest = ${len(args)}")
     
     where_clause = ""
     if conditions:
         where_clause = "WHERE " + " AND ".join(conditions)
     
-    query = f'SELECT * FROM flight_features."{dataset_safe}" {where_clause} ORDER BY flight_key ASC, time_of_track ASC'
-    
     try:
-        # Use psycopg2 directly for sync connection
-        import psycopg2
-        
-        conn = psycopg2.connect(
-            host="localhost",
-            port=5433,
-            user="my_user",
-            password="MyStrongPass123!",
-            database="my_app_db"
-        )
+        dataset_columns = await get_columns(engine, "flight_features", dataset_safe)
+        if not dataset_columns:
+            return {"success": False, "error": f"Dataset not found: {dataset_safe}"}
         
-        # Read in chunks to avoid memory issues
-        chunks = []
-        chunk_size = 500000
-        offset = 0
+        # Project in catalog order; only catalog names reach the SQL
+        wanted = set(columns or PARQUET_COLUMNS)
+        columns = [col for col in dataset_columns if col["column_name"] in wanted] or dataset_columns
         
-        while True:
-            chunk_query = f"{query} LIMIT {chunk_size} OFFSET {offset}"
-            df_chunk = pd.read_sql(chunk_query, conn)
-            
-            if len(df_chunk) == 0:
-                break
-                
-            chunks.append(df_chunk)
-            offset += chunk_size
-            
-            if len(df_chunk) < chunk_size:
-                break
+        query = f'SELECT {nan_safe_select_list(columns)} FROM flight_features.{qident(dataset_safe)} {where_clause}'
+        schema = arrow_schema(
+            [col["column_name"] for col in columns],
+            {col["column_name"]: col["data_type"] for col in columns},
+        )
         
-        conn.close()
+        # PostgreSQL encodes the rows server-side with COPY and streams them in
+        # one pass (no LIMIT/OFFSET re-scans, no per-row Python objects, no
+        # sort - datasets are created in key order and each row group is sorted
+        # on write), while Arrow's C CSV reader decodes and writes row groups
+        # as they arrive
+        object_key = get_parquet_key(dataset, dep, dest)
+        if PARQUET_LOCAL_CACHE:
+            row_count = await _copy_to_parquet_file(engine, query, args, parquet_path, schema, row_group_size)
+            buffer = None
+        else:
+            # Build the file in memory and upload it without a disk round-trip
+            sink = pa.BufferOutputStream()
+            row_count = await _copy_to_parquet(engine, query, args, sink, schema, row_group_size)
+            buffer = sink.getvalue()
         
-        if not chunks:
+        if row_count == 0:
             return {"success": False, "error": "No data found"}
         
-        # Combine chunks
-        df = pd.concat(chunks, ignore_index=True)
-        
-        # Write to parquet with gzip compression (DuckDB WASM has issues with snappy)
-        table = pa.Table.from_pandas(df)
-        pq.write_table(
-            table,
-            parquet_path,
-            compression='gzip',
-            use_dictionary=True,
-            write_statistics=True
-        )
-        
         # Upload to R2 for CDN-backed downloads
-        object_key = get_parquet_key(dataset, dep, dest)
         try:
-            r2_url = upload_parquet_to_r2(parquet_path, object_key)
-            size = os.path.getsize(parquet_path)
+            if buffer is None:
+                r2_url = await upload_parquet_to_r2(parquet_path, object_key)
+                size = os.path.getsize(parquet_path)
+            else:
+                r2_url = await upload_parquet_fileobj_to_r2(pa.BufferReader(buffer), object_key)
+                size = buffer.size
             return {
                 "success": True,
                 "cached": False,
-                "rows": len(df),
+                "rows": row_count,
                 "r2_url": r2_url,
                 "size_bytes": size,
                 "size_mb": round(size / 1024 / 1024, 2),
@@ -166,11 +357,14 @@ async def generate_parquet(
             }
         except Exception as upload_error:
             # R2 upload failed, fall back to local
-            info = parquet_exists(dataset, dep, dest)
+            if buffer is not None:
+                with open(parquet_path, 'wb') as f:
+                    f.write(buffer)
+            info = await parquet_exists(dataset, dep, dest)
             return {
                 "success": True,
                 "cached": False,
-                "rows": len(df),
+                "rows": row_count,
                 "r2_upload_error": str(upload_error),
                 **info
             }
@@ -179,18 +373,63 @@ async def generate_parquet(
         return {"success": False, "error": str(e)}
 
 
+async def generate_all_parquets(
+    engine: AsyncEngine,
+    dataset: str,
+    shard_by: tuple[str, ...] = ('dep', 'dest'),
+    force: bool = False
+) -> dict:
+    """
+    Generate one Parquet file per distinct (dep, dest) shard of a dataset -
+    or per dep / per dest - running up to PARQUET_EXPORT_CONCURRENCY shard
+    exports at once (the size of the converter pool).
+    """
+    dataset_safe = _NAME_SANITIZER.sub('_', dataset)
+    shard_cols = [col for col in ('dep', 'dest') if col in shard_by]
+    if not shard_cols:
+        return {"success": False, "error": "shard_by must include dep and/or dest"}
+    
+    # Empty/NULL values would read as "no filter" in generate_parquet
+    non_empty = " AND ".join(f"{col} <> ''" for col in shard_cols)
+    query = text(f'SELECT DISTINCT {", ".join(shard_cols)} FROM flight_features.{qident(dataset_safe)} WHERE {non_empty}')
+    try:
+        async with engine.connect() as conn:
+            result = await conn.execute(query)
+            shards = [dict(zip(shard_cols, row)) for row in result]
+    except Exception as e:
+        return {"success": False, "error": str(e)}
+    
+    semaphore = asyncio.Semaphore(PARQUET_EXPORT_CONCURRENCY)
+    
+    async def export_shard(shard: dict) -> dict:
+        async with semaphore:
+            result = await generate_parquet(engine, dataset, dep=shard.get('dep'), dest=shard.get('dest'), force=force)
+        return {**shard, **result}
+    
+    results = await asyncio.gather(*(export_shard(shard) for shard in shards))
+    failed = sum(1 for result in results if not result.get("success"))
+    return {
+        "success": failed == 0,
+        "dataset": dataset_safe,
+        "shards": len(results),
+        "failed": failed,
+        "results": results,
+    }
+
+
 async def list_parquet_files() -> list[dict]:
     """List all available parquet files"""
     files = []
     if os.path.exists(PARQUET_DIR):
-        for filename in os.listdir(PARQUET_DIR):
-            if filename.endswith('.parquet'):
-                path = os.path.join(PARQUET_DIR, filename)
-                size = os.path.getsize(path)
-                files.append({
-                    "filename": filename,
-                    "dataset": filename.replace('.parquet', ''),
-                    "size_bytes": size,
-                    "size_mb": round(size / 1024 / 1024, 2)
-                })
+        # scandir entries carry the name and a cached stat - no path joins or extra lookups
+        with os.scandir(PARQUET_DIR) as entries:
+            for entry in entries:
+                if entry.name.endswith('.parquet') and entry.is_file():
+                    size = entry.stat().st_size
+                    files.append({
+                        "filename": entry.name,
+                        "dataset": entry.name.replace('.parquet', ''),
+                        "size_bytes": size,
+                        "size_mb": round(size / 1024 / 1024, 2)
+                    })
     return files
@@ -0,0 +1,128 @@
+"""
+Background Parquet generation jobs.
+Lets dataset creation return as soon as the table exists while the Parquet
+export and R2 upload run on the event loop. Job status is kept as small JSON
+files next to the local Parquet cache so any API worker can answer a poll.
+"""
+import asyncio
+import json
+import os
+import re
+import time
+import uuid
+from sqlalchemy.ext.asyncio import AsyncEngine
+from .parquet_export import PARQUET_DIR, generate_all_parquets, generate_parquet
+
+JOBS_DIR = os.path.join(PARQUET_DIR, "jobs")
+os.makedirs(JOBS_DIR, exist_ok=True)
+
+_JOB_ID_RE = re.compile(r'^[0-9a-f]{32}$')
+
+# A job still "running" after this many seconds died with its process
+# (killed worker) and is reported as failed
+PARQUET_JOB_TIMEOUT = int(os.getenv("PARQUET_JOB_TIMEOUT", "3600"))
+
+# Job status files older than this are deleted when a new job starts
+PARQUET_JOB_RETENTION = 24 * 3600
+
+# Strong references so running tasks aren't garbage collected
+_running_tasks: set[asyncio.Task] = set()
+
+
+def _job_path(job_id: str) -> str:
+    return os.path.join(JOBS_DIR, f"{job_id}.json")
+
+
+def _write_job(job_id: str, status: dict) -> None:
+    # Write then rename so pollers never see a half-written file
+    tmp_path = _job_path(job_id) + ".tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(status, f)
+    os.replace(tmp_path, _job_path(job_id))
+
+
+def _prune_jobs() -> None:
+    """Delete job status files past PARQUET_JOB_RETENTION"""
+    cutoff = time.time() - PARQUET_JOB_RETENTION
+    with os.scandir(JOBS_DIR) as entries:
+        for entry in entries:
+            try:
+                if entry.stat().st_mtime < cutoff:
+                    os.remove(entry.path)
+            except OSError:
+                pass
+
+
+async def _run_job(job_id: str, status: dict, export) -> None:
+    # Stays as the result if the task is cancelled (shutdown, DEV reload)
+    result = {"success": False, "error": "Job was interrupted before it finished"}
+    try:
+        result = await export
+    except Exception as e:
+        result = {"success": False, "error": str(e)}
+    finally:
+        _write_job(job_id, {
+            **status,
+            "status": "done" if result.get("success") else "failed",
+            "finished": time.time(),
+            "result": result,
+        })
+
+
+def _start_job(details: dict, export) -> str:
+    """Record a running job, schedule the export coroutine and return the job ID"""
+    try:
+        _prune_jobs()
+    except OSError as e:
+        print(f"Error pruning parquet jobs: {e}")
+    
+    job_id = uuid.uuid4().hex
+    status = {"job_id": job_id, "status": "running", **details, "started": time.time()}
+    _write_job(job_id, status)
+    
+    task = asyncio.create_task(_run_job(job_id, status, export))
+    _running_tasks.add(task)
+    task.add_done_callback(_running_tasks.discard)
+    return job_id
+
+
+def start_parquet_job(
+    engine: AsyncEngine,
+    dataset: str,
+    dep: str = None,
+    dest: str = None,
+    force: bool = False
+) -> str:
+    """Schedule generate_parquet in the background and return its job ID"""
+    return _start_job(
+        {"dataset": dataset, "dep": dep, "dest": dest},
+        generate_parquet(engine, dataset, dep=dep, dest=dest, force=force),
+    )
+
+
+def start_parquet_shards_job(
+    engine: AsyncEngine,
+    dataset: str,
+    shard_by: tuple[str, ...] = ('dep', 'dest'),
+    force: bool = False
+) -> str:
+    """Schedule generate_all_parquets in the background and return its job ID"""
+    return _start_job(
+        {"dataset": dataset, "shard_by": list(shard_by)},
+        generate_all_parquets(engine, dataset, shard_by=shard_by, force=force),
+    )
+
+
+def get_parquet_job(job_id: str) -> dict:
+    """Get the status of a background Parquet job"""
+    if not _JOB_ID_RE.match(job_id):
+        return {"job_id": job_id, "status": "unknown", "error": "Invalid job ID"}
+    try:
+        with open(_job_path(job_id)) as f:
+            status = json.load(f)
+    except FileNotFoundError:
+        return {"job_id": job_id, "status": "unknown", "error": "Job not found"}
+    
+    if status.get("status") == "running" and time.time() - status.get("started", 0) > PARQUET_JOB_TIMEOUT:
+        return {**status, "status": "failed", "error": "Job did not finish (worker stopped?)"}
+    return status
@@ -1,7 +1,13 @@
 """
 Cloudflare R2 Storage Service for Parquet Files
+boto3 is blocking, so every R2 call runs in a worker thread (the client is
+thread-safe) and the helpers are awaitable from the async API.
 """
+import asyncio
+import hashlib
+import time
 import boto3
+from boto3.s3.transfer import TransferConfig
 from botocore.config import Config
 import os
 
@@ -23,8 +29,31 @@ s3_client = boto3.client(
     region_name='auto'
 )
 
+# Multipart upload settings - large parquet files go up as parallel parts
+# instead of one serial stream over a single connection
+PARQUET_TRANSFER_CONFIG = TransferConfig(
+    multipart_threshold=8 * 1024 * 1024,
+    multipart_chunksize=16 * 1024 * 1024,
+    max_concurrency=8,
+    use_threads=True,
+)
+PARQUET_CONTENT_TYPE = 'application/vnd.apache.parquet'
+
+# Existence cache - avoids a head_object round-trip per check. A bucket
+# listing also answers "not found" for any key missing from it until it expires.
+R2_EXISTS_TTL = 30
+_exists_cache: dict[str, tuple[bool, float]] = {}
+_listed_at = 0.0
+
+# Manifest writes are skipped when the content is unchanged since the last PUT
+_manifest_hash = None
+
+
+def _remember_exists(object_key: str, exists: bool) -> None:
+    _exists_cache[object_key] = (exists, time.monotonic())
+
 
-def upload_parquet_to_r2(local_path: str, object_key: str) -> str:
+async def upload_parquet_to_r2(local_path: str, object_key: str) -> str:
     """
     Upload a parquet file to R2 and return the public URL.
     
@@ -37,13 +66,17 @@ def upload_parquet_to_r2(local_path: str, object_key: str) -> str:
     """
     try:
         # Upload file
-        s3_client.upload_file(
+        await asyncio.to_thread(
+            s3_client.upload_file,
             local_path,
             R2_BUCKET_NAME,
             object_key,
-            ExtraArgs={'ContentType': 'application/octet-stream'}
+            Config=PARQUET_TRANSFER_CONFIG,
+            ExtraArgs={'ContentType': PARQUET_CONTENT_TYPE}
         )
         
+        _remember_exists(object_key, True)
+        
         # Return public URL
         public_url = f"{R2_PUBLIC_URL}/{object_key}"
         return public_url
@@ -52,7 +85,28 @@ def upload_parquet_to_r2(local_path: str, object_key: str) -> str:
         raise Exception(f"Failed to upload to R2: {str(e)}")
 
 
-def check_parquet_exists_in_r2(object_key: str) -> bool:
+async def upload_parquet_fileobj_to_r2(fileobj, object_key: str) -> str:
+    """
+    Upload a parquet file from a readable file object (e.g. an in-memory
+    buffer) to R2 and return the public URL.
+    """
+    try:
+        await asyncio.to_thread(
+            s3_client.upload_fileobj,
+            fileobj,
+            R2_BUCKET_NAME,
+            object_key,
+            Config=PARQUET_TRANSFER_CONFIG,
+            ExtraArgs={'ContentType': PARQUET_CONTENT_TYPE}
+        )
+        _remember_exists(object_key, True)
+        return f"{R2_PUBLIC_URL}/{object_key}"
+        
+    except Exception as e:
+        raise Exception(f"Failed to upload to R2: {str(e)}")
+
+
+async def check_parquet_exists_in_r2(object_key: str) -> bool:
     """
     Check if a parquet file exists in R2.
     
@@ -62,11 +116,21 @@ def check_parquet_exists_in_r2(object_key: str) -> bool:
     Returns:
         True if exists, False otherwise
     """
+    now = time.monotonic()
+    cached = _exists_cache.get(object_key)
+    if cached is not None and now - cached[1] < R2_EXISTS_TTL:
+        return cached[0]
+    if now - _listed_at < R2_EXISTS_TTL:
+        # Not in a fresh bucket listing
+        return False
+    
     try:
-        s3_client.head_object(Bucket=R2_BUCKET_NAME, Key=object_key)
-        return True
+        await asyncio.to_thread(s3_client.head_object, Bucket=R2_BUCKET_NAME, Key=object_key)
+        exists = True
     except:
-        return False
+        exists = False
+    _remember_exists(object_key, exists)
+    return exists
 
 
 def get_parquet_public_url(object_key: str) -> str:
@@ -82,7 +146,7 @@ def get_parquet_public_url(object_key: str) -> str:
     return f"{R2_PUBLIC_URL}/{object_key}"
 
 
-def delete_parquet_from_r2(object_key: str) -> bool:
+async def delete_parquet_from_r2(object_key: str) -> bool:
     """
     Delete a parquet file from R2.
     
@@ -93,26 +157,32 @@ def delete_parquet_from_r2(object_key: str) -> bool:
         True if deleted, False otherwise
     """
     try:
-        s3_client.delete_object(Bucket=R2_BUCKET_NAME, Key=object_key)
+        await asyncio.to_thread(s3_client.delete_object, Bucket=R2_BUCKET_NAME, Key=object_key)
+        _remember_exists(object_key, False)
         return True
     except:
         return False
 
 
-def list_parquets_in_r2() -> list[dict]:
+async def list_parquets_in_r2() -> list[dict]:
     """
     List all parquet files in R2 bucket.
     
     Returns:
         List of parquet file info with name and public URL
     """
+    global _listed_at
     try:
-        response = s3_client.list_objects_v2(Bucket=R2_BUCKET_NAME)
+        listed_at = time.monotonic()
         files = []
         
-        if 'Contents' in response:
-            for obj in response['Contents']:
+        # One request per 1000 keys, and every listed key refreshes the existence cache
+        paginator = s3_client.get_paginator('list_objects_v2')
+        pages = await asyncio.to_thread(lambda: list(paginator.paginate(Bucket=R2_BUCKET_NAME)))
+        for page in pages:
+            for obj in page.get('Contents', []):
                 key = obj['Key']
+                _exists_cache[key] = (True, listed_at)
                 if key.endswith('.parquet'):
                     # Extract dataset name from filename
                     dataset_name = key.replace('.parquet', '')
@@ -123,9 +193,10 @@ def list_parquets_in_r2() -> list[dict]:
                         "size_mb": round(obj['Size'] / 1024 / 1024, 2),
                         "last_modified": obj['LastModified'].isoformat()
                     })
+        _listed_at = listed_at
         
         # Update manifest file in R2 for direct access
-        update_manifest_in_r2(files)
+        await update_manifest_in_r2(files)
         
         return files
     except Exception as e:
@@ -133,19 +204,30 @@ def list_parquets_in_r2() -> list[dict]:
         return []
 
 
-def update_manifest_in_r2(files: list[dict]) -> None:
+async def update_manifest_in_r2(files: list[dict]) -> None:
     """
     Update the datasets.json manifest file in R2.
     This allows the frontend to fetch the list directly from R2 without tunnel.
     """
     import json
+    global _manifest_hash
     try:
-        manifest = json.dumps(files)
-        s3_client.put_object(
+        body = json.dumps(files).encode('utf-8')
+        digest = hashlib.sha256(body).hexdigest()
+        if digest == _manifest_hash:
+            return
+        
+        await asyncio.to_thread(
+            s3_client.put_object,
             Bucket=R2_BUCKET_NAME,
             Key='datasets.json',
-            Body=manifest.encode('utf-8'),
-            ContentType='application/json'
+            Body=body,
+            ContentType='application/json',
+            # Browsers/edge reuse it for 30 s, then revalidate against R2's ETag
+            # with If-None-Match (a 304 while unchanged)
+            CacheControl='public, max-age=30, stale-while-revalidate=300',
+            Metadata={'sha256': digest}
         )
+        _manifest_hash = digest
     except Exception as e:
         print(f"Error updating manifest: {e}")
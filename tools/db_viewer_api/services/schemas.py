@@ -2,7 +2,10 @@
 from sqlalchemy import text
 from sqlalchemy.ext.asyncio import AsyncEngine
 
+from .cache import DATASET_METADATA_TTL, ttl_cache
 
+
+@ttl_cache(ttl=DATASET_METADATA_TTL)
 async def get_schemas(engine: AsyncEngine) -> list[dict]:
     query = text("""
         SELECT schema_name
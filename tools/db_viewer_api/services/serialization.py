@@ -0,0 +1,92 @@
+"""
+JSON / Arrow IPC encoding helpers for row payloads coming straight from the database.
+"""
+import io
+
+import orjson
+import pyarrow as pa
+
+# NaN/Inf floats become null; dates/times and anything else orjson can't
+# encode natively (Decimal, timedelta, ...) fall back to str()
+_ORJSON_OPTIONS = orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_PASSTHROUGH_DATETIME
+
+
+def dumps_json(content) -> bytes:
+    """Encode a JSON document"""
+    return orjson.dumps(content, default=str, option=_ORJSON_OPTIONS)
+
+
+def dumps_ndjson_rows(columns: list[str], rows) -> bytes:
+    """Encode rows as newline-delimited JSON objects keyed by column name"""
+    return b"".join(
+        orjson.dumps(dict(zip(columns, row)), default=str, option=_ORJSON_OPTIONS | orjson.OPT_APPEND_NEWLINE)
+        for row in rows
+    )
+
+
+# ============== Arrow IPC ==============
+
+ARROW_STREAM_MEDIA_TYPE = "application/vnd.apache.arrow.stream"
+
+# information_schema data_type -> Arrow type; anything else is sent as string
+_ARROW_TYPES = {
+    "smallint": pa.int16(),
+    "integer": pa.int32(),
+    "bigint": pa.int64(),
+    "real": pa.float32(),
+    "double precision": pa.float64(),
+    "boolean": pa.bool_(),
+    "text": pa.string(),
+    "character varying": pa.string(),
+    "character": pa.string(),
+    "date": pa.date32(),
+    "time without time zone": pa.time64("us"),
+    "timestamp without time zone": pa.timestamp("us"),
+    "timestamp with time zone": pa.timestamp("us", tz="UTC"),
+}
+
+
+def arrow_schema(columns: list[str], column_types: dict[str, str]) -> pa.Schema:
+    """Build a fixed Arrow schema from PostgreSQL column types"""
+    return pa.schema([
+        (col, _ARROW_TYPES.get(column_types.get(col), pa.string()))
+        for col in columns
+    ])
+
+
+def arrow_batch(schema: pa.Schema, rows) -> pa.RecordBatch:
+    """Convert a chunk of DB rows into a record batch with the given schema"""
+    values = list(zip(*rows)) if rows else [() for _ in schema]
+    arrays = []
+    for field, column in zip(schema, values):
+        if pa.types.is_string(field.type):
+            column = [None if v is None else v if isinstance(v, str) else str(v) for v in column]
+        arrays.append(pa.array(column, type=field.type))
+    return pa.RecordBatch.from_arrays(arrays, schema=schema)
+
+
+class ArrowStreamEncoder:
+    """Encodes record batches as an Arrow IPC stream, handing back bytes as they're written"""
+
+    def __init__(self, schema: pa.Schema):
+        self.schema = schema
+        self._buffer = io.BytesIO()
+        self._writer = pa.ipc.new_stream(self._buffer, schema)
+
+    def _drain(self) -> bytes:
+        data = self._buffer.getvalue()
+        self._buffer.seek(0)
+        self._buffer.truncate()
+        return data
+
+    def start(self) -> bytes:
+        """The stream's schema message, available as soon as the encoder is created"""
+        return self._drain()
+
+    def write(self, rows) -> bytes:
+        self._writer.write_batch(arrow_batch(self.schema, rows))
+        return self._drain()
+
+    def close(self) -> bytes:
+        self._writer.close()
+        return self._drain()